@@ -0,0 +1,135 @@
+"""Redis cache for Elasticpath catalog data that is shown by the shop bot."""
+import hashlib
+from typing import List, Optional, Tuple, Type
+
+import orjson
+from redis import Redis
+
+from elasticpath.api import ElasticpathAPI
+from elasticpath.models import Product
+
+CATALOG_CACHE_TTL = 300
+PRODUCT_CARD_CACHE_TTL = 600
+PRODUCTS_VERSION_KEY = 'products:version'
+TELEGRAM_PHOTO_CACHE_TTL = 7 * 24 * 60 * 60
+
+
+class ProductCache:
+    """Elasticpath products and their images, cached in Redis for all bot processes."""
+
+    def __init__(
+            self,
+            elasticpath_api: ElasticpathAPI,
+            redis: Redis,
+            ttl: int = CATALOG_CACHE_TTL,
+    ) -> None:
+        self.elasticpath_api = elasticpath_api
+        self.redis = redis
+        self.ttl = ttl
+
+    def get_products(self, *, limit: int, offset: int) -> List[Product]:
+        """Get a page of products."""
+        cache_key = products_cache_key(limit=limit, offset=offset)
+        cached_products = self.redis.get(cache_key)
+        if cached_products is not None:
+            return [
+                load_model(Product, product_data) for product_data in orjson.loads(cached_products)
+            ]
+
+        products = self.elasticpath_api.products.get_products(limit=limit, offset=offset)
+        self.redis.setex(
+            cache_key,
+            self.ttl,
+            orjson.dumps([dump_model(product) for product in products]),
+        )
+        return products
+
+    def refresh_products(self, *, limit: int, offset: int) -> None:
+        """Put a fresh page of products into the cache, bump catalog version if the page changed."""
+        products = self.elasticpath_api.products.get_products(limit=limit, offset=offset)
+        products_data = orjson.dumps([dump_model(product) for product in products])
+        products_digest = hashlib.blake2b(products_data, digest_size=16).hexdigest()
+
+        cache_key = products_cache_key(limit=limit, offset=offset)
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.setex(cache_key, self.ttl, products_data)
+        pipeline.getset(f'{cache_key}:digest', products_digest)
+        _, previous_digest = pipeline.execute()
+        if previous_digest != products_digest:
+            self.bump_products_version()
+
+    def get_products_version(self) -> str:
+        """Get catalog version, it changes every time the catalog is updated."""
+        return self.redis.get(PRODUCTS_VERSION_KEY) or '0'
+
+    def bump_products_version(self) -> None:
+        """Mark catalog as updated, so views built from the previous catalog are rebuilt."""
+        self.redis.incr(PRODUCTS_VERSION_KEY)
+
+    def get_product(self, product_id: str) -> Product:
+        """Get product by id."""
+        cache_key = f'product:{product_id}'
+        cached_product = self.redis.get(cache_key)
+        if cached_product is not None:
+            return load_model(Product, orjson.loads(cached_product))
+
+        product = self.elasticpath_api.products.get_product(product_id)
+        self.redis.setex(cache_key, self.ttl, orjson.dumps(dump_model(product)))
+        return product
+
+    def get_product_card(self, product_id: str) -> Tuple[Product, Optional[str]]:
+        """Get product by id together with the link to its main image, if it has one."""
+        cache_key = f'product_full:{product_id}'
+        cached_card = self.redis.get(cache_key)
+        if cached_card is not None:
+            product_data, image_link = orjson.loads(cached_card)
+            return load_model(Product, product_data), image_link
+
+        product, image_link = self.elasticpath_api.products.get_product_with_image(product_id)
+        product_data = dump_model(product)
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.setex(cache_key, PRODUCT_CARD_CACHE_TTL, orjson.dumps([product_data, image_link]))
+        # the product itself is requested right after its card, when it is added to a cart
+        pipeline.setex(f'product:{product_id}', self.ttl, orjson.dumps(product_data))
+        pipeline.execute()
+        return product, image_link
+
+    def get_telegram_photo_id(self, bot_id: int, image_link: str) -> Optional[str]:
+        """Get ID of the photo the bot sent to Telegram from the image link, if there is one."""
+        return self.redis.get(telegram_photo_cache_key(bot_id, image_link))
+
+    def save_telegram_photo_id(self, bot_id: int, image_link: str, telegram_photo_id: str) -> None:
+        """Remember ID Telegram gave to the photo the bot sent from the image link."""
+        self.redis.setex(
+            telegram_photo_cache_key(bot_id, image_link),
+            TELEGRAM_PHOTO_CACHE_TTL,
+            telegram_photo_id,
+        )
+
+    def forget_telegram_photo_id(self, bot_id: int, image_link: str) -> None:
+        """Forget ID of the photo sent from the image link, e.g. when Telegram doesn't accept it."""
+        self.redis.delete(telegram_photo_cache_key(bot_id, image_link))
+
+
+def products_cache_key(*, limit: int, offset: int) -> str:
+    """Get Redis key for a page of products."""
+    return f'products:{limit}:{offset}'
+
+
+def telegram_photo_cache_key(bot_id: int, image_link: str) -> str:
+    """Get Redis key for ID of the photo the bot sent to Telegram from the image link."""
+    # photo IDs are valid only for the bot that has received them
+    return f'telegram_photo:{bot_id}:{image_link}'
+
+
+def dump_model(model: Product) -> dict:
+    """Convert Elasticpath model into a dict with its attributes."""
+    return {attribute: getattr(model, attribute) for attribute in model.__slots__}
+
+
+def load_model(model_class: Type[Product], model_data: dict) -> Product:
+    """Restore Elasticpath model from a dict with its attributes."""
+    model = model_class.__new__(model_class)
+    for attribute, attribute_value in model_data.items():
+        setattr(model, attribute, attribute_value)
+    return model
@@ -1,25 +1,71 @@
 """Wrapper for Elasticpath API."""
 import contextlib
+import fcntl
+import functools
+import hashlib
 import logging
+import operator
+import os
+import stat
+import tempfile
+import threading
 import time
-from json.decoder import JSONDecodeError
-from typing import Callable, Iterable, List, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Iterable, Iterator, List, Optional, Tuple, Union
 
+import cachetools
 import httpx
+import ijson
+import orjson
 
 from elasticpath.models import Cart, CartItem, Entry, Field, File, Flow, Product, Customer
 
 ELASTICPATH_AUTH_URL = 'https://api.moltin.com/oauth/access_token'
 ELASTICPATH_API_URL = 'https://api.moltin.com/v2'
 
+BULK_REQUESTS_CONCURRENCY = 10
+PREFETCHED_PAGES_AMOUNT = 4
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+CACHE_MAX_SIZE = 1024
+CACHE_TTL = 300
+CONDITIONAL_CACHE_MAX_SIZE = 1024
+
+LOGGED_ERROR_BODY_LIMIT = 512
+
+AVAILABLE_FIELD_TYPES = frozenset(
+    ('string', 'integer', 'boolean', 'float', 'relationship', 'date'),
+)
+
+TOKEN_CACHE_DIR = tempfile.gettempdir()
+TOKEN_EXPIRATION_MARGIN = 60
+
 logger = logging.getLogger()
 
+_http_client = httpx.Client(
+    base_url=ELASTICPATH_API_URL,
+    http2=True,
+    limits=httpx.Limits(max_connections=64, max_keepalive_connections=64, keepalive_expiry=30.0),
+    timeout=httpx.Timeout(10.0, connect=5.0),
+)
+
 
 class ElasticpathAPI:
-    """Wrapper for Elasticpath API."""
+    """
+    Wrapper for Elasticpath API.
 
-    def __init__(self, client_id: str, client_secret: Optional[str] = None) -> None:
-        self._session = _APISession(client_id, client_secret)
+    All wrappers share one pooled HTTP/2 client unless `http_client` is provided, the provided
+    client must use ELASTICPATH_API_URL as its base URL.
+    """
+
+    def __init__(
+            self,
+            client_id: str,
+            client_secret: Optional[str] = None,
+            http_client: Optional[httpx.Client] = None,
+    ) -> None:
+        self._session = _APISession(client_id, client_secret, http_client)
 
         self.products = _ProductsAPI(self._session)
         self.carts = _CartsAPI(self._session)
@@ -32,65 +78,272 @@ class ElasticpathAPI:
 class _APISession:
     """Elasticpath API HTTP connection."""
 
-    def __init__(self, client_id: str, client_secret: Optional[str] = None) -> None:
-        self._client = None
+    def __init__(
+            self,
+            client_id: str,
+            client_secret: Optional[str] = None,
+            http_client: Optional[httpx.Client] = None,
+    ) -> None:
+        self._http_client = _http_client if http_client is None else http_client
+
+        self._auth_headers = {}
         self._expires_at = 0
+        self._auth_lock = threading.Lock()
+        self._refresh_timer = None
 
         self._client_id = client_id
         self._client_secret = client_secret
 
+        self._executor = ThreadPoolExecutor(max_workers=BULK_REQUESTS_CONCURRENCY)
+
+        self._conditional_cache = cachetools.LRUCache(maxsize=CONDITIONAL_CACHE_MAX_SIZE)
+        self._conditional_cache_lock = threading.Lock()
+
     @property
-    def client(self) -> httpx.Client:
-        """Authorize client to work with Elasticpath API. Refresh after expiration."""
-        if (self._client is None) or (time.time() >= self._expires_at):
-            client, expires_at = self._authorize()
-            self._client = client
-            self._expires_at = expires_at
-        return self._client
+    def auth_headers(self) -> dict:
+        """
+        Authorize at Elasticpath API. The access token is refreshed in background.
+
+        The same headers dict is updated on refresh, so it's shared by all requests.
+        """
+        if time.time() >= self._expires_at:
+            with self._auth_lock:
+                if time.time() >= self._expires_at:
+                    self._refresh_access_token()
+        return self._auth_headers
 
     def get(self, *args, **kwargs) -> httpx.Response:
         """Perform HTTP GET request."""
-        return self._make_request(self.client.get, *args, **kwargs)
+        return self._make_request('GET', *args, **kwargs)
 
     def post(self, *args, **kwargs) -> httpx.Response:
         """Perform HTTP POST request."""
-        return self._make_request(self.client.post, *args, **kwargs)
+        return self._make_request('POST', *args, **kwargs)
 
     def delete(self, *args, **kwargs) -> httpx.Response:
         """Perform HTTP DELETE request."""
-        return self._make_request(self.client.delete, *args, **kwargs)
+        return self._make_request('DELETE', *args, **kwargs)
 
-    def _make_request(self, requester: Callable, *args, **kwargs) -> httpx.Response:
-        """Perform HTTP request with error handling."""
-        response = requester(*args, **kwargs)
-        try:
-            response.raise_for_status()
-        except httpx.HTTPStatusError:
-            with contextlib.suppress(JSONDecodeError):
-                logger.error(response.json())
-            raise
+    def get_data(
+            self,
+            url: str,
+            *,
+            conditional: bool = False,
+            parse: Optional[Callable[[Any], Any]] = None,
+            **kwargs,
+    ) -> Any:
+        """
+        Perform HTTP GET request, return the data sent by the API, parsed by `parse` if it's given.
+
+        Conditional request sends ETag of the data received before and reuses the object parsed
+        from that data if the API responds that it's not modified.
+        """
+        if parse is None:
+            parse = _keep_data
+        if not conditional:
+            return parse(orjson.loads(self.get(url, **kwargs).content)['data'])
+
+        cache_key = (url, tuple(sorted(kwargs.get('params', {}).items())))
+        with self._conditional_cache_lock:
+            etag, cached_object = self._conditional_cache.get(cache_key, (None, None))
+
+        headers = None if etag is None else {'If-None-Match': etag}
+        response = self.get(url, headers=headers, **kwargs)
+        if response.status_code == httpx.codes.NOT_MODIFIED:
+            return cached_object
+
+        # only the parsed object is kept, not the payload it was built from
+        parsed_object = parse(orjson.loads(response.content)['data'])
+        if 'ETag' in response.headers:
+            with self._conditional_cache_lock:
+                self._conditional_cache[cache_key] = (response.headers['ETag'], parsed_object)
+        return parsed_object
+
+    def post_data(self, *args, **kwargs) -> Any:
+        """Perform HTTP POST request, return the data sent by the API."""
+        return orjson.loads(self.post(*args, **kwargs).content)['data']
+
+    @contextlib.contextmanager
+    def stream(self, method: str, *args, **kwargs) -> Iterator[httpx.Response]:
+        """Perform HTTP request without reading the response body in advance."""
+        response_stream = self._http_client.stream(
+            method,
+            *args,
+            headers=self.auth_headers,
+            **kwargs,
+        )
+        with response_stream as response:
+            _raise_for_status(response)
+            yield response
+
+    def gather(self, function: Callable, arguments: Iterable) -> List[Any]:
+        """Call function for every argument concurrently, keep the order of results."""
+        return list(self._executor.map(function, arguments))
+
+    def _make_request(
+            self,
+            method: str,
+            *args,
+            headers: Optional[dict] = None,
+            json: Optional[Any] = None,
+            **kwargs,
+    ) -> httpx.Response:
+        """
+        Perform HTTP request with error handling.
+
+        JSON body is serialized with orjson rather than the stdlib encoder used by httpx.
+        """
+        if (headers is None) and (json is None):
+            headers = self.auth_headers
+        else:
+            headers = {**(headers or {}), **self.auth_headers}
+        if json is not None:
+            kwargs['content'] = orjson.dumps(json)
+            headers['Content-Type'] = 'application/json'
+
+        response = self._http_client.request(method, *args, headers=headers, **kwargs)
+        _raise_for_status(response)
         return response
 
-    def _authorize(self) -> Tuple[httpx.Client, int]:
-        """Authorize at Elasticpath API."""
+    def _refresh_access_token(self) -> None:
+        """Get new access token and schedule its refresh shortly before the expiration."""
+        access_token, expires_at = self._authorize()
+        self._auth_headers['Authorization'] = f'Bearer {access_token}'
+        self._expires_at = expires_at
+
+        if self._refresh_timer is not None:
+            self._refresh_timer.cancel()
+        refresh_delay = max(expires_at - TOKEN_EXPIRATION_MARGIN - time.time(), 0)
+        self._refresh_timer = threading.Timer(refresh_delay, self._refresh_in_background)
+        self._refresh_timer.daemon = True
+        self._refresh_timer.start()
+
+    def _refresh_in_background(self) -> None:
+        """Refresh the access token so requests never wait for authorization."""
+        with self._auth_lock:
+            try:
+                self._refresh_access_token()
+            except Exception:
+                # the next request authorizes in the foreground if the refresh has failed
+                logger.exception('Background refresh of Elasticpath access token failed')
+
+    def _authorize(self) -> Tuple[str, int]:
+        """
+        Authorize at Elasticpath API.
+
+        The access token is cached in a file shared by all processes with the same credentials,
+        the file lock prevents concurrent processes from requesting tokens simultaneously.
+        """
+        token_cache_path = self._token_cache_path()
+        try:
+            # a symlink planted in place of the cache file is not followed
+            token_cache_fd = os.open(
+                token_cache_path,
+                os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW,
+                0o600,
+            )
+        except OSError:
+            logger.warning('Access token cache %s can not be opened', token_cache_path)
+            return self._request_access_token()
+
+        with os.fdopen(token_cache_fd, 'r+b') as token_cache:
+            # the mode is applied only on creation, a file created by someone else isn't trusted
+            if not _is_private_file(token_cache_fd):
+                logger.warning('Access token cache %s is not private', token_cache_path)
+                return self._request_access_token()
+            fcntl.flock(token_cache, fcntl.LOCK_EX)
+
+            with contextlib.suppress(orjson.JSONDecodeError, KeyError):
+                cached_token = orjson.loads(token_cache.read())
+                if cached_token['expires'] - TOKEN_EXPIRATION_MARGIN > time.time():
+                    return cached_token['access_token'], cached_token['expires']
+
+            access_token, expires_at = self._request_access_token()
+
+            token_cache.seek(0)
+            token_cache.truncate()
+            token_cache.write(orjson.dumps({'access_token': access_token, 'expires': expires_at}))
+
+        return access_token, expires_at
+
+    def _request_access_token(self) -> Tuple[str, int]:
+        """Get new access token from Elasticpath API."""
+        response = self._http_client.post(ELASTICPATH_AUTH_URL, data=self._auth_data())
+        response.raise_for_status()
+
+        auth_payload = orjson.loads(response.content)
+
+        return auth_payload['access_token'], auth_payload['expires']
+
+    def _auth_data(self) -> dict:
+        """Form data for authorization request, depends on whether client secret is provided."""
         if self._client_secret is None:
-            auth_data = {'client_id': self._client_id, 'grant_type': 'implicit'}
-        else:
-            auth_data = {
-                'client_id': self._client_id,
-                'client_secret': self._client_secret,
-                'grant_type': 'client_credentials',
-            }
-        response = httpx.post(ELASTICPATH_AUTH_URL, data=auth_data)
+            return {'client_id': self._client_id, 'grant_type': 'implicit'}
+        return {
+            'client_id': self._client_id,
+            'client_secret': self._client_secret,
+            'grant_type': 'client_credentials',
+        }
+
+    def _token_cache_path(self) -> str:
+        """Path to the access token cache file for current credentials."""
+        credentials = f'{self._client_id}:{self._client_secret}'.encode()
+        credentials_hash = hashlib.sha256(credentials).hexdigest()[:16]
+        return os.path.join(TOKEN_CACHE_DIR, f'elasticpath_token_{credentials_hash}.json')
+
+
+def _is_private_file(file_descriptor: int) -> bool:
+    """Check that the file is a regular file of the current user, inaccessible to others."""
+    file_stat = os.fstat(file_descriptor)
+    is_accessible_to_others = file_stat.st_mode & (stat.S_IRWXG | stat.S_IRWXO)
+    is_owned = file_stat.st_uid == os.getuid()
+    return stat.S_ISREG(file_stat.st_mode) and is_owned and not is_accessible_to_others
+
+
+def _raise_for_status(response: httpx.Response) -> None:
+    """Raise an error for unsuccessful response, log the error details sent by the API."""
+    try:
         response.raise_for_status()
+    except httpx.HTTPStatusError:
+        if logger.isEnabledFor(logging.ERROR):
+            # a broken error body must not mask the HTTP error itself
+            with contextlib.suppress(httpx.HTTPError, httpx.StreamError):
+                response.read()
+                logger.error(
+                    'Elasticpath API error %s: %s',
+                    response.status_code,
+                    response.text[:LOGGED_ERROR_BODY_LIMIT],
+                )
+        raise
 
-        access_token = response.json()['access_token']
-        expires_at = response.json()['expires']
 
-        return (
-            httpx.Client(headers={'Authorization': f'Bearer {access_token}'}),
-            expires_at,
-        )
+def _keep_data(data: Any) -> Any:
+    """Return the data sent by the API as it is."""
+    return data
+
+
+def _parse_products(products_data: List[dict]) -> Tuple['Product', ...]:
+    """Build products from the data of a products page."""
+    return tuple(map(Product, products_data))
+
+
+class _ChunkedFile:
+    """
+    Binary file that is iterated by fixed-size chunks.
+
+    httpx iterates over a file to stream it in multipart body, plain binary file would be split
+    by newline bytes into chunks of arbitrary size.
+    """
+
+    def __init__(self, file_object: BinaryIO, chunk_size: int = UPLOAD_CHUNK_SIZE) -> None:
+        self._file_object = file_object
+        self._chunk_size = chunk_size
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(functools.partial(self._file_object.read, self._chunk_size), b'')
+
+    def __getattr__(self, attribute_name: str) -> Any:
+        return getattr(self._file_object, attribute_name)
 
 
 class _ProductsAPI:
@@ -98,14 +351,43 @@ class _ProductsAPI:
 
     def __init__(self, session: _APISession) -> None:
         self._session = session
-        self._url = f'{ELASTICPATH_API_URL}/products'
+        self._path = '/products'
 
+        self._cache = cachetools.TTLCache(maxsize=CACHE_MAX_SIZE, ttl=CACHE_TTL)
+        self._cache_lock = threading.Lock()
+
+    @cachetools.cachedmethod(operator.attrgetter('_cache'), lock=operator.attrgetter('_cache_lock'))
     def get_product(self, product_id: str) -> 'Product':
         """Get product by id."""
-        response = self._session.get(f'{self._url}/{product_id}')
-        product_data = response.json()['data']
+        return self._session.get_data(
+            f'{self._path}/{product_id}',
+            conditional=True,
+            parse=Product,
+        )
 
-        return Product(product_data)
+    @cachetools.cachedmethod(
+        operator.attrgetter('_cache'),
+        key=functools.partial(cachetools.keys.hashkey, 'with_image'),
+        lock=operator.attrgetter('_cache_lock'),
+    )
+    def get_product_with_image(self, product_id: str) -> Tuple['Product', Optional[str]]:
+        """Get product by id together with the link to its main image in a single request."""
+        response = self._session.get(
+            f'{self._path}/{product_id}',
+            params={'include': 'main_image'},
+        )
+        product_payload = orjson.loads(response.content)
+
+        product = Product(product_payload['data'])
+        main_images = product_payload.get('included', {}).get('main_images', [])
+        image_links = (
+            image['link']['href'] for image in main_images if image['id'] == product.main_image_id
+        )
+        return product, next(image_links, None)
+
+    def get_products_bulk(self, product_ids: Iterable[str]) -> List['Product']:
+        """Get several products by ids with concurrent requests."""
+        return self._session.gather(self.get_product, product_ids)
 
     def create_product(
             self,
@@ -143,37 +425,73 @@ class _ProductsAPI:
             'status': status,
             'commodity_type': commodity_type,
         }
-        response = self._session.post(f'{self._url}', json={'data': product_data})
-        product_data = response.json()['data']
+        product_data = self._session.post_data(self._path, json={'data': product_data})
+        self._clear_cache()
 
         return Product(product_data)
 
     def get_products(self, *, limit: int = 10, offset: int = 0) -> List['Product']:
         """Get all products from the API using limit/offset pagination."""
-        response = self._session.get(
-            f'{self._url}',
+        products = self._session.get_data(
+            self._path,
+            conditional=True,
+            parse=_parse_products,
             params={'page[limit]': limit, 'page[offset]': offset},
         )
-        all_products_data = response.json()['data']
+        # the cached page is shared, callers get their own list
+        return list(products)
 
-        products = []
-        for product_data in all_products_data:
-            products.append(Product(product_data))
-        return products
+    def iter_all_products(self, page_size: int = 100) -> Iterator['Product']:
+        """Get all products from the API, several next pages are requested concurrently."""
+        offset = 0
+        while True:
+            pages = self._session.gather(
+                lambda page_offset: self.get_products(limit=page_size, offset=page_offset),
+                range(offset, offset + page_size * PREFETCHED_PAGES_AMOUNT, page_size),
+            )
+            for page in pages:
+                yield from page
+                if len(page) < page_size:
+                    return
+            offset += page_size * PREFETCHED_PAGES_AMOUNT
+
+    def iter_products(self, *, limit: int = 10, offset: int = 0) -> Iterator['Product']:
+        """Get products from the API one by one, parsing the response while it's being received."""
+        products_data = ijson.sendable_list()
+        products_parser = ijson.items_coro(products_data, 'data.item', use_float=True)
+        with self._session.stream(
+            'GET',
+            self._path,
+            params={'page[limit]': limit, 'page[offset]': offset},
+        ) as response:
+            for chunk in filter(None, response.iter_bytes()):
+                # an empty chunk would signal the end of data to the parser
+                products_parser.send(chunk)
+                yield from map(Product, products_data)
+                del products_data[:]
+        products_parser.close()
+        yield from map(Product, products_data)
 
     def add_file_to_product(self, elasticpath_file: 'File', product: 'Product'):
         """Create relationship between a file and a product."""
         self._session.post(
-            f'{self._url}/{product.id}/relationships/files',
+            f'{self._path}/{product.id}/relationships/files',
             json=[{'type': 'file', 'id': elasticpath_file.id}],
         )
+        self._clear_cache()
 
     def add_main_image_to_product(self, elasticpath_file: 'File', product: 'Product'):
         """Create relationship between a file and a product."""
         self._session.post(
-            f'{self._url}/{product.id}/relationships/main-image',
+            f'{self._path}/{product.id}/relationships/main-image',
             json={'data': {'type': 'main_image', 'id': elasticpath_file.id}},
         )
+        self._clear_cache()
+
+    def _clear_cache(self) -> None:
+        """Invalidate cached products after changing them."""
+        with self._cache_lock:
+            self._cache.clear()
 
 
 class _CartsAPI:
@@ -181,12 +499,15 @@ class _CartsAPI:
 
     def __init__(self, session: _APISession) -> None:
         self._session = session
-        self._url = f'{ELASTICPATH_API_URL}/carts'
+        self._path = '/carts'
+
+        self._cache = cachetools.TTLCache(maxsize=CACHE_MAX_SIZE, ttl=CACHE_TTL)
+        self._cache_lock = threading.Lock()
 
+    @cachetools.cachedmethod(operator.attrgetter('_cache'), lock=operator.attrgetter('_cache_lock'))
     def get_or_create_cart(self, cart_reference: Union[str, int]) -> 'Cart':
         """Get cart by reference, create if it doesn't exist."""
-        response = self._session.get(f'{self._url}/{cart_reference}')
-        cart_data = response.json()['data']
+        cart_data = self._session.get_data(f'{self._path}/{cart_reference}')
 
         return Cart(cart_reference, cart_data)
 
@@ -200,25 +521,60 @@ class _CartsAPI:
             },
         }
         self._session.post(
-            f'{self._url}/{cart.reference}/items',
+            f'{self._path}/{cart.reference}/items',
             json=product_data,
         )
+        self._forget_cart(cart)
+
+    def add_products_to_cart(
+            self, cart: 'Cart', items: Iterable[Tuple['Product', int]],
+    ) -> List[dict]:
+        """
+        Add several products to a cart with concurrent requests.
+
+        A failure of one product doesn't interrupt the others. Result contains a status for every
+        product: {'id': product ID, 'ok': whether product was added, 'error': exception or None}.
+        """
+        def add_item(item: Tuple['Product', int]) -> dict:
+            product, quantity = item
+            try:
+                self.add_product_to_cart(product, cart, quantity)
+            except httpx.HTTPError as error:
+                return {'id': product.id, 'ok': False, 'error': error}
+            return {'id': product.id, 'ok': True, 'error': None}
+
+        return self._session.gather(add_item, items)
 
     def get_cart_items(self, cart: 'Cart') -> List['CartItem']:
         """Get contents of a cart."""
-        cart_items_url = f'{self._url}/{cart.reference}/items'
-        response = self._session.get(cart_items_url)
-        all_cart_items_data = response.json()['data']
+        cart_items_url = f'{self._path}/{cart.reference}/items'
+        all_cart_items_data = self._session.get_data(cart_items_url)
 
         cart_items = []
         for cart_item_data in all_cart_items_data:
             cart_items.append(CartItem(cart_item_data))
         return cart_items
 
+    def get_cart_with_items(
+            self, cart_reference: Union[str, int],
+    ) -> Tuple['Cart', List['CartItem']]:
+        """Get cart by reference together with its contents in a single request."""
+        response = self._session.get(
+            f'{self._path}/{cart_reference}',
+            params={'include': 'items'},
+        )
+        cart_payload = orjson.loads(response.content)
+
+        cart_items = []
+        for cart_item_data in cart_payload.get('included', {}).get('items', []):
+            cart_items.append(CartItem(cart_item_data))
+        return Cart(cart_reference, cart_payload['data']), cart_items
+
     def remove_cart_item(self, cart: 'Cart', cart_item_id) -> None:
         """Remove item from cart."""
-        cart_item_url = f'{self._url}/{cart.reference}/items/{cart_item_id}'
+        cart_item_url = f'{self._path}/{cart.reference}/items/{cart_item_id}'
         self._session.delete(cart_item_url)
+        self._forget_cart(cart)
 
     def amount_of_product_in_cart(self, product_id: str, cart: 'Cart') -> int:
         """Get amount of a product (specified by ID) in cart."""
@@ -231,30 +587,54 @@ class _CartsAPI:
 
         return amount
 
+    def _forget_cart(self, cart: 'Cart') -> None:
+        """Invalidate cached cart after changing its contents, its total price has changed."""
+        with self._cache_lock:
+            self._cache.pop(cachetools.keys.hashkey(cart.reference), None)
+
 
 class _FilesAPI:
     """Wrapper for Elasticpath files resource."""
 
     def __init__(self, session: _APISession) -> None:
         self._session = session
-        self._url = f'{ELASTICPATH_API_URL}/files'
+        self._path = '/files'
+
+        self._cache = cachetools.TTLCache(maxsize=CACHE_MAX_SIZE, ttl=CACHE_TTL)
+        self._cache_lock = threading.Lock()
 
+    @cachetools.cachedmethod(operator.attrgetter('_cache'), lock=operator.attrgetter('_cache_lock'))
     def get_file(self, file_id: str) -> 'File':
         """Get single file from Elasticpath."""
-        response = self._session.get(f'{self._url}/{file_id}')
-        file_data = response.json()['data']
+        return self._session.get_data(f'{self._path}/{file_id}', conditional=True, parse=File)
 
-        return File(file_data)
+    def get_files_bulk(self, file_ids: Iterable[str]) -> List['File']:
+        """Get several files by ids with concurrent requests."""
+        return self._session.gather(self.get_file, file_ids)
 
-    def create_file(self, file_name: str, is_public: bool = True) -> 'File':
-        """Create file in Elasticpath."""
-        with open(file_name, 'r+b') as file_descriptor:
-            response = self._session.post(
-                f'{self._url}',
-                json={'public': is_public},
-                files={'file': file_descriptor},
-            )
-        file_data = response.json()['data']
+    def create_file(
+            self,
+            file_name: str,
+            is_public: bool = True,
+            file_object: Optional[BinaryIO] = None,
+    ) -> 'File':
+        """
+        Create file in Elasticpath.
+
+        File is read from disk by its name, unless an already open binary `file_object` is
+        provided, in-memory content can be uploaded then with `file_name` as its name.
+        """
+        if file_object is None:
+            with open(file_name, 'rb') as file_descriptor:
+                return self.create_file(file_name, is_public, file_object=file_descriptor)
+
+        file_data = self._session.post_data(
+            self._path,
+            data={'public': 'true' if is_public else 'false'},
+            files={'file': (os.path.basename(file_name), _ChunkedFile(file_object))},
+        )
+        with self._cache_lock:
+            self._cache.clear()
 
         return File(file_data)
 
@@ -264,7 +644,7 @@ class _CustomersAPI:
 
     def __init__(self, session: _APISession) -> None:
         self._session = session
-        self._url = f'{ELASTICPATH_API_URL}/customers'
+        self._path = '/customers'
 
     def create_customer(self, email: str, name: str = 'Anonymous') -> 'Customer':
         """Create customer in ElasticPath shop."""
@@ -275,8 +655,7 @@ class _CustomersAPI:
                 'email': email,
             },
         }
-        response = self._session.post(f'{self._url}', json=customer_data)
-        customer_data = response.json()['data']
+        customer_data = self._session.post_data(self._path, json=customer_data)
 
         return Customer(customer_data)
 
@@ -286,7 +665,7 @@ class _FlowsAPI:
 
     def __init__(self, session: _APISession) -> None:
         self._session = session
-        self._url = f'{ELASTICPATH_API_URL}/flows'
+        self._path = '/flows'
 
     def create_flow(self, enabled: bool, description: str, slug: str, name: str) -> Flow:
         """Create flow in ElasticPath shop."""
@@ -299,9 +678,8 @@ class _FlowsAPI:
                 'enabled': enabled,
             },
         }
-        response = self._session.post(f'{self._url}', json=flow_data)
+        flow_data = self._session.post_data(self._path, json=flow_data)
 
-        flow_data = response.json()['data']
         return Flow(flow_data)
 
     def create_entry(self, flow: Union[str, Flow], fields: dict) -> None:
@@ -319,17 +697,16 @@ class _FlowsAPI:
                 **fields,
             },
         }
-        self._session.post(f'{self._url}/{flow_slug}/entries', json=entry_data)
+        self._session.post(f'{self._path}/{flow_slug}/entries', json=entry_data)
 
     def get_entries(self, slug: str, *, limit: int = 10, offset: int = 0) -> List[Entry]:
         """Get entries for a specified flow."""
-        response = self._session.get(
-            f'{self._url}/{slug}/entries',
+        entries_data = self._session.get_data(
+            f'{self._path}/{slug}/entries',
             params={'page[limit]': limit, 'page[offset]': offset},
         )
 
         entries = []
-        entries_data = response.json()['data']
         for entry in entries_data:
             entries.append(Entry(entry))
 
@@ -350,7 +727,7 @@ class _FieldsAPI:
 
     def __init__(self, session: _APISession) -> None:
         self._session = session
-        self._url = f'{ELASTICPATH_API_URL}/fields'
+        self._path = '/fields'
 
     def create_field(
             self,
@@ -363,9 +740,10 @@ class _FieldsAPI:
             flow: Flow,
     ) -> Field:
         """Create field in ElasticPath shop."""
-        available_types = ['string', 'integer', 'boolean', 'float', 'relationship', 'date']
-        if field_type not in available_types:
-            raise ValueError(f'Field type {field_type} must be one of {available_types}')
+        if field_type not in AVAILABLE_FIELD_TYPES:
+            raise ValueError(
+                f'Field type {field_type} must be one of {sorted(AVAILABLE_FIELD_TYPES)}',
+            )
 
         field_data = {
             'data': {
@@ -386,7 +764,6 @@ class _FieldsAPI:
                 },
             },
         }
-        response = self._session.post(f'{self._url}', json=field_data)
+        field_data = self._session.post_data(self._path, json=field_data)
 
-        field_data = response.json()['data']
         return Field(field_data)
@@ -5,103 +5,111 @@ from typing import Union
 class Product:
     """Represents a product from Elasticpath shop."""
 
-    def __init__(self, product_data: dict):
-        self._product_data = product_data
+    __slots__ = (
+        'id',
+        'name',
+        'description',
+        'formatted_price',
+        'stock_level',
+        'stock_availability',
+        'main_image_id',
+    )
 
-        self.id = self._product_data['id']
-        self.name = self._product_data['name']
-        self.description = self._product_data['description']
+    def __init__(self, product_data: dict):
+        self.id = product_data['id']
+        self.name = product_data['name']
+        self.description = product_data['description']
 
-        product_meta = self._product_data['meta']
+        product_meta = product_data['meta']
         self.formatted_price = product_meta['display_price']['with_tax']['formatted']
         self.stock_level = product_meta['stock']['level']
         self.stock_availability = product_meta['stock']['availability']
 
-        main_image = self._product_data['relationships'].get('main_image')
+        main_image = product_data['relationships'].get('main_image')
         self.main_image_id = main_image['data']['id'] if main_image is not None else None
 
 
 class Cart:
     """Represents a cart from Elasticpath shop."""
 
-    def __init__(self, reference: Union[str, int], cart_data: dict):
-        self._cart_data = cart_data
+    __slots__ = ('reference', 'id', 'formatted_price')
 
+    def __init__(self, reference: Union[str, int], cart_data: dict):
         self.reference = reference
-        self.id = self._cart_data['id']
+        self.id = cart_data['id']
 
-        cart_meta = self._cart_data['meta']
+        cart_meta = cart_data['meta']
         self.formatted_price = cart_meta['display_price']['with_tax']['formatted']
 
 
 class CartItem:
     """Represents a cart item from Elasticpath shop."""
 
-    def __init__(self, cart_item_data: dict):
-        self._cart_item_data = cart_item_data
+    __slots__ = ('id', 'name', 'product_id', 'quantity', 'description', 'formatted_price')
 
-        self.id = self._cart_item_data['id']
-        self.name = self._cart_item_data['name']
-        self.product_id = self._cart_item_data['product_id']
-        self.quantity = self._cart_item_data['quantity']
-        self.description = self._cart_item_data['description']
+    def __init__(self, cart_item_data: dict):
+        self.id = cart_item_data['id']
+        self.name = cart_item_data['name']
+        self.product_id = cart_item_data['product_id']
+        self.quantity = cart_item_data['quantity']
+        self.description = cart_item_data['description']
 
-        cart_item_meta = self._cart_item_data['meta']
+        cart_item_meta = cart_item_data['meta']
         self.formatted_price = cart_item_meta['display_price']['with_tax']['unit']['formatted']
 
 
 class File:
     """Represents a file from Elasticpath shop."""
 
-    def __init__(self, file_data: dict):
-        self._file_data = file_data
+    __slots__ = ('id', 'link')
 
-        self.id = self._file_data['id']
-        self.link = self._file_data['link']['href']
+    def __init__(self, file_data: dict):
+        self.id = file_data['id']
+        self.link = file_data['link']['href']
 
 
 class Flow:
     """Represents a flow from Elasticpath shop."""
 
-    def __init__(self, flow_data: dict):
-        self._flow_data = flow_data
+    __slots__ = ('id', 'name', 'slug')
 
-        self.id = self._flow_data['id']
-        self.name = self._flow_data['name']
-        self.slug = self._flow_data['slug']
+    def __init__(self, flow_data: dict):
+        self.id = flow_data['id']
+        self.name = flow_data['name']
+        self.slug = flow_data['slug']
 
 
 class Field:
     """Represents a field from Elasticpath shop."""
 
-    def __init__(self, field_data: dict):
-        self._field_data = field_data
+    __slots__ = ('id', 'name', 'slug')
 
-        self.id = self._field_data['id']
-        self.name = self._field_data['name']
-        self.slug = self._field_data['slug']
+    def __init__(self, field_data: dict):
+        self.id = field_data['id']
+        self.name = field_data['name']
+        self.slug = field_data['slug']
 
 
 class Entry:
     """Represents a field entry from Elasticpath shop."""
 
-    def __init__(self, entry_data: dict):
-        self._entry_data = entry_data
+    __slots__ = ('id', 'fields')
 
-        self.id = self._entry_data['id']
+    def __init__(self, entry_data: dict):
+        self.id = entry_data['id']
 
         self.fields = {}
-        for key in self._entry_data.keys():
+        for key in entry_data.keys():
             if key not in ('id', 'type', 'meta', 'links'):
-                self.fields[key] = self._entry_data[key]
+                self.fields[key] = entry_data[key]
 
 
 class Customer:
     """Represents a customer from Elasticpath shop."""
 
-    def __init__(self, entry_data: dict):
-        self._entry_data = entry_data
+    __slots__ = ('id', 'name', 'email')
 
-        self.id = self._entry_data['id']
-        self.name = self._entry_data['name']
-        self.email = self._entry_data['email']
+    def __init__(self, customer_data: dict):
+        self.id = customer_data['id']
+        self.name = customer_data['name']
+        self.email = customer_data['email']
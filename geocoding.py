@@ -1,11 +1,19 @@
 """Module to work with geocoding-related stuff."""
+import threading
 from typing import Tuple
 
 import httpx
+import numpy as np
+import orjson
 
-from settings import settings
+from settings import get_settings
 
 YANDEX_GEOCODER_API_URL = 'https://geocode-maps.yandex.ru/1.x'
+EARTH_RADIUS = 6_371_000
+
+# the client is created on the first geocoding request, most bot sessions never get to it
+_http_client = None
+_http_client_lock = threading.Lock()
 
 
 class UnknownAddressError(Exception):
@@ -14,14 +22,63 @@ class UnknownAddressError(Exception):
 
 def fetch_coordinates(address: str) -> Tuple[float, float]:
     """Get latitude and longitude of a place by address."""
-    response = httpx.get(
-        YANDEX_GEOCODER_API_URL,
-        params={'geocode': address, 'apikey': settings.yandex_geocoder_api_key, 'format': 'json'},
+    response = _get_http_client().get(
+        '',
+        params={
+            'geocode': address,
+            'apikey': get_settings().yandex_geocoder_api_key,
+            'format': 'json',
+        },
     )
     response.raise_for_status()
 
-    found_places = response.json()['response']['GeoObjectCollection']['featureMember']
+    geocoder_response = orjson.loads(response.content)
+    found_places = geocoder_response['response']['GeoObjectCollection']['featureMember']
     if not found_places:
         raise UnknownAddressError
     most_relevant = found_places[0]
-    return most_relevant['GeoObject']['Point']['pos'].split(' ')
+    longitude, _, latitude = most_relevant['GeoObject']['Point']['pos'].partition(' ')
+    return float(longitude), float(latitude)
+
+
+def haversine_distances(
+        longitude: float,
+        latitude: float,
+        longitudes: np.ndarray,
+        latitudes: np.ndarray,
+) -> np.ndarray:
+    """
+    Calculate distances in meters between a place and each of the places.
+
+    Coordinates of the place are in degrees, `longitudes` and `latitudes` of the places are arrays
+    of radians, so they can be converted once for many calls.
+    """
+    longitude, latitude = np.radians(longitude), np.radians(latitude)
+    latitude_haversine = np.sin((latitudes - latitude) / 2) ** 2
+    longitude_haversine = np.sin((longitudes - longitude) / 2) ** 2
+    haversine = latitude_haversine + np.cos(latitude) * np.cos(latitudes) * longitude_haversine
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(haversine))
+
+
+def close_client() -> None:
+    """Close connections to the geocoder API."""
+    with _http_client_lock:
+        if _http_client is not None:
+            _http_client.close()
+
+
+def _get_http_client() -> httpx.Client:
+    """Get the geocoder API client, create it on the first call."""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                base_url=YANDEX_GEOCODER_API_URL,
+                limits=httpx.Limits(
+                    max_keepalive_connections=20,
+                    max_connections=100,
+                    keepalive_expiry=300,
+                ),
+                timeout=5.0,
+            )
+        return _http_client
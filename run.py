@@ -1,12 +1,16 @@
 """Entry point to operate with Elasticpath Shop Bot."""
 import logging
 
+import geocoding
 import telegram_bot
 
 
 def main() -> None:
     logging.basicConfig(level=logging.INFO)
-    telegram_bot.start_bot()
+    try:
+        telegram_bot.start_bot()
+    finally:
+        geocoding.close_client()
 
 
 if __name__ == '__main__':
@@ -1,11 +1,11 @@
 """Settings for Elasticpath Shop Bot."""
-from dataclasses import dataclass
+from functools import lru_cache
+from typing import NamedTuple
 
 from environs import Env
 
 
-@dataclass(frozen=True)
-class Settings:
+class Settings(NamedTuple):
     """Settings for Elasticpath Shop Bot."""
 
     tg_bot_token: str
@@ -18,8 +18,9 @@ class Settings:
     shop_flow: str
 
 
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
-    """Read environment settings."""
+    """Read environment settings, they are read once per process."""
     env = Env()
     env.read_env()
     return Settings(
@@ -32,6 +33,3 @@ def get_settings() -> Settings:
         yandex_geocoder_api_key=env('YANDEX_GEOCODER_API_KEY', None),
         shop_flow=env('SHOP_FLOW', None),
     )
-
-
-settings = get_settings()
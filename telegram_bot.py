@@ -1,35 +1,184 @@
 """Telegram bot for Elasticpath shop."""
-import json
-from typing import Callable, List
-
-from geopy.distance import distance
-from redis import Redis
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ParseMode, Update
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, suppress
+from functools import lru_cache, partial
+from typing import Callable, Deque, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import cachetools
+import numpy as np
+from redis import BlockingConnectionPool, Redis
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto, Message
+from telegram import ParseMode, Update
+from telegram.error import BadRequest, TelegramError
 from telegram.ext import CallbackContext, Filters, Updater
 from telegram.ext import CallbackQueryHandler, CommandHandler, MessageHandler
 
+from cache import CATALOG_CACHE_TTL, ProductCache
 from elasticpath.api import ElasticpathAPI
-from elasticpath.models import Entry
-from geocoding import UnknownAddressError, fetch_coordinates
-from settings import settings
+from elasticpath.models import Cart, Entry
+from geocoding import UnknownAddressError, fetch_coordinates, haversine_distances
+from settings import get_settings
+
+logger = logging.getLogger()
 
-START_STATE = 'start state'
-PRODUCT_LIST_STATE = 'product list state'
-PRODUCT_DESCRIPTION_STATE = 'product description state'
-CART_STATE = 'cart state'
-WAIT_EMAIL_STATE = 'wait for email state'
-WAIT_LOCATION_STATE = 'wait for location state'
+# states are stored in Redis as their numbers and index the tuple of state handlers
+START_STATE = 0
+PRODUCT_LIST_STATE = 1
+PRODUCT_DESCRIPTION_STATE = 2
+CART_STATE = 3
+WAIT_LOCATION_STATE = 4
 
 PRODUCT_LIST_CALLBACK_DATA = 'product list callback'
 SHOW_CART_CALLBACK_DATA = 'show cart callback'
 CHECKOUT_CALLBACK_DATA = 'order callback'
 NEXT_PAGE_CALLBACK_DATA = 'next page'
 PREVIOUS_PAGE_CALLBACK_DATA = 'previous page'
+CALLBACK_DATA_SEPARATOR = '|'
+ADD_TO_CART_CALLBACK_PREFIX = f'p{CALLBACK_DATA_SEPARATOR}'
 
 PRODUCT_LIST_PAGE = 'page'
 PRODUCT_LIST_PAGE_SIZE = 8
 AVAILABLE_PRODUCT_AMOUNTS = (1, )
 
+USER_SESSION_KEY_PREFIX = 'user:'
+SESSION_STATE_FIELD = 'state'
+USER_SESSION_TTL = 24 * 60 * 60
+
+# every busy worker may hold a Redis connection, so the pool is bigger than the worker count
+BOT_WORKERS = 32
+CONCURRENT_REQUESTS_WORKERS = 16
+# button presses are acknowledged by their own workers, so they don't wait behind the requests
+ANSWER_WORKERS = 4
+REDIS_MAX_CONNECTIONS = BOT_WORKERS + CONCURRENT_REQUESTS_WORKERS + 2
+REDIS_HEALTH_CHECK_INTERVAL = 30
+PRODUCT_MARKUP_CACHE_SIZE = 1024
+PAGE_MARKUP_CACHE_SIZE = 256
+# add-to-cart presses of a chat within this window (in seconds) are added to the cart at once
+ADD_TO_CART_WINDOW = 0.1
+# the first product list page is refreshed before its cache entry expires
+PRODUCT_LIST_WARM_UP_INTERVAL = CATALOG_CACHE_TTL - 60
+SHOPS_REFRESH_INTERVAL = 600
+MESSAGE_NOT_MODIFIED_ERROR = 'Message is not modified'
+ADD_TO_CART_FAILED_TEXT = 'Failed to add to cart, please try again'
+
+# buttons are the same for every user, so they are built once
+PREVIOUS_PAGE_BUTTON = InlineKeyboardButton('<<<', callback_data=PREVIOUS_PAGE_CALLBACK_DATA)
+NEXT_PAGE_BUTTON = InlineKeyboardButton('>>>', callback_data=NEXT_PAGE_CALLBACK_DATA)
+BACK_TO_MENU_BUTTON = InlineKeyboardButton(
+    text='Back to menu',
+    callback_data=PRODUCT_LIST_CALLBACK_DATA,
+)
+SHOW_CART_BUTTON = InlineKeyboardButton(text='Show cart', callback_data=SHOW_CART_CALLBACK_DATA)
+CHECKOUT_BUTTON = InlineKeyboardButton(text='Checkout', callback_data=CHECKOUT_CALLBACK_DATA)
+PRODUCT_DESCRIPTION_MENU_ROWS = ([BACK_TO_MENU_BUTTON], [SHOW_CART_BUTTON])
+CART_MENU_ROWS = ([CHECKOUT_BUTTON], [BACK_TO_MENU_BUTTON])
+
+
+class NoShopsError(Exception):
+    """Raised when the shop flow has no shops, so there is nothing to deliver from."""
+
+
+class Shops(NamedTuple):
+    """Shop entries with their coordinates in radians, stored as arrays in the same order."""
+
+    entries: List[Entry]
+    longitudes: np.ndarray
+    latitudes: np.ndarray
+
+
+class CartAdditionPress(NamedTuple):
+    """Add-to-cart button press."""
+
+    product_id: str
+    amount: int
+    update: Update
+    context: CallbackContext
+
+
+class CartAdditionsCoalescer:
+    """
+    Collect add-to-cart presses of a chat and pass them on as a single batch.
+
+    The first press of a chat starts a short window, all presses of the chat made within that
+    window are passed to `add_to_cart` together when it ends. The batch is handled in the bot
+    worker pool, so its errors reach the dispatcher error handlers.
+    """
+
+    def __init__(
+            self,
+            add_to_cart: Callable[[int, List[CartAdditionPress]], None],
+            window: float = ADD_TO_CART_WINDOW,
+    ) -> None:
+        self._add_to_cart = add_to_cart
+        self._window = window
+        self._pending_presses: Dict[int, List[CartAdditionPress]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, chat_id: int, press: CartAdditionPress) -> None:
+        """Remember a press until the end of the chat's window."""
+        with self._lock:
+            chat_presses = self._pending_presses.get(chat_id)
+            if chat_presses is None:
+                chat_presses = self._pending_presses[chat_id] = []
+                press.context.job_queue.run_once(self._flush, self._window, context=chat_id)
+            chat_presses.append(press)
+
+    def _flush(self, context: CallbackContext) -> None:
+        """Pass on all presses made by a chat within its window."""
+        chat_id = context.job.context
+        with self._lock:
+            chat_presses = self._pending_presses.pop(chat_id)
+        # the job queue only hands the batch over, requests are made by a bot worker
+        context.dispatcher.run_async(
+            self._add_to_cart,
+            chat_id,
+            chat_presses,
+            update=chat_presses[-1].update,
+        )
+
+
+class ChatTask(NamedTuple):
+    """Work to do for a chat, with the update its errors are reported for."""
+
+    run: Callable[[], None]
+    update: Update
+    context: CallbackContext
+
+
+class ChatTaskQueue:
+    """
+    Run tasks of every chat one at a time, in the order they come.
+
+    A worker never waits for a busy chat: a task of a chat that is already running another one is
+    queued and run by the worker that runs the chat's tasks. Errors of the tasks are passed to the
+    dispatcher error handlers, so the queued tasks are run anyway.
+    """
+
+    def __init__(self) -> None:
+        self._pending_tasks: Dict[int, Deque[ChatTask]] = {}
+        self._lock = threading.Lock()
+
+    def run(self, chat_id: int, task: ChatTask) -> None:
+        """Run the task and the chat tasks queued meanwhile, or queue it if the chat is busy."""
+        with self._lock:
+            chat_tasks = self._pending_tasks.get(chat_id)
+            if chat_tasks is not None:
+                chat_tasks.append(task)
+                return
+            # an empty queue marks the chat as busy
+            chat_tasks = self._pending_tasks[chat_id] = deque()
+
+        while True:
+            run_reporting_errors(task)
+            with self._lock:
+                if not chat_tasks:
+                    del self._pending_tasks[chat_id]
+                    return
+                task = chat_tasks.popleft()
+
 
 class ElasticpathShopBot:
     """Telegram bot for Elasticpath shop."""
@@ -38,13 +187,44 @@ class ElasticpathShopBot:
         self.elasticpath_api = elasticpath_api
         self.users_db = users_db
         self.shop_flow = shop_flow
+        self.product_cache = ProductCache(elasticpath_api, users_db)
+
+        self._page_markup_cache = cachetools.TTLCache(
+            maxsize=PAGE_MARKUP_CACHE_SIZE,
+            ttl=CATALOG_CACHE_TTL,
+        )
+        self._page_markup_cache_lock = threading.Lock()
+        self._products_version = None
 
-        self._state_functions = {
-            START_STATE: self.handle_start_state,
-            PRODUCT_LIST_STATE: self.handle_product_list_state,
-            PRODUCT_DESCRIPTION_STATE: self.handle_product_description_state,
-            CART_STATE: self.handle_cart_state,
-            WAIT_LOCATION_STATE: self.handle_location_state,
+        self._chat_tasks = ChatTaskQueue()
+
+        self._cart_additions = CartAdditionsCoalescer(self.add_pressed_products_to_cart)
+        # runs independent requests of a handler concurrently
+        self._executor = ThreadPoolExecutor(max_workers=CONCURRENT_REQUESTS_WORKERS)
+        self._answer_executor = ThreadPoolExecutor(max_workers=ANSWER_WORKERS)
+
+        # shops are loaded at startup and replaced as a whole by refresh_shops
+        self._shops = self.load_shops()
+
+        self._state_handlers = (
+            self.handle_start_state,
+            self.handle_product_list_state,
+            self.handle_product_description_state,
+            self.handle_cart_state,
+            self.handle_location_state,
+        )
+        # buttons of a state that are handled the same way every time, by their callback data
+        self._product_list_buttons = {
+            NEXT_PAGE_CALLBACK_DATA: self.handle_next_page_button,
+            PREVIOUS_PAGE_CALLBACK_DATA: self.handle_previous_page_button,
+        }
+        self._product_description_buttons = {
+            PRODUCT_LIST_CALLBACK_DATA: self.handle_back_to_menu_button,
+            SHOW_CART_CALLBACK_DATA: self.handle_show_cart_button,
+        }
+        self._cart_buttons = {
+            PRODUCT_LIST_CALLBACK_DATA: self.handle_back_to_menu_button,
+            CHECKOUT_CALLBACK_DATA: self.handle_checkout_button,
         }
 
     def handle_users_reply(self, update: Update, context: CallbackContext):
@@ -57,74 +237,149 @@ class ElasticpathShopBot:
             chat_id = update.callback_query.message.chat_id
         else:
             return
-        if user_reply == '/start':
+        # handlers run concurrently, updates of one chat would overwrite each other's session
+        self._chat_tasks.run(
+            chat_id,
+            ChatTask(
+                run=partial(self.handle_chat_reply, update, context, chat_id, user_reply),
+                update=update,
+                context=context,
+            ),
+        )
+
+    def handle_chat_reply(
+            self,
+            update: Update,
+            context: CallbackContext,
+            chat_id: int,
+            user_reply: str,
+    ) -> None:
+        """Get current state from the DB, execute specific handler and save the next state."""
+        # user session is a Redis hash, so it is read and written by a single command each
+        session_key = f'{USER_SESSION_KEY_PREFIX}{chat_id}'
+        user_session = self.users_db.hgetall(session_key)
+        state_in_db = user_session.get(SESSION_STATE_FIELD)
+        if user_reply == '/start' or state_in_db is None:
             user_state = START_STATE
         else:
-            state_in_db = self.users_db.get(chat_id)
-            user_state = START_STATE if state_in_db is None else state_in_db.decode('utf-8')
+            user_state = int(state_in_db)
+        context.chat_data[PRODUCT_LIST_PAGE] = int(user_session.get(PRODUCT_LIST_PAGE, 0))
 
-        state_handler = self._state_functions[user_state]
+        state_handler = self._state_handlers[user_state]
         next_state = state_handler(update, context)
-        self.users_db.set(chat_id, next_state)
+        # abandoned sessions expire, the update and the TTL refresh share one round trip
+        session_pipeline = self.users_db.pipeline()
+        session_pipeline.hset(
+            session_key,
+            mapping={
+                SESSION_STATE_FIELD: next_state,
+                PRODUCT_LIST_PAGE: context.chat_data[PRODUCT_LIST_PAGE],
+            },
+        )
+        session_pipeline.expire(session_key, USER_SESSION_TTL)
+        session_pipeline.execute()
 
-    def handle_start_state(self, update: Update, context: CallbackContext) -> str:
+    def handle_start_state(self, update: Update, context: CallbackContext) -> int:
         """Show available products."""
-        context.user_data[PRODUCT_LIST_PAGE] = 0
+        context.chat_data[PRODUCT_LIST_PAGE] = 0
         self.show_product_list(update, context)
         return PRODUCT_LIST_STATE
 
-    def handle_product_list_state(self, update: Update, context: CallbackContext) -> str:
+    def handle_product_list_state(self, update: Update, context: CallbackContext) -> int:
         """Move between product list pages or show the description for a chosen product."""
         callback_data = update.callback_query.data
 
-        if callback_data == NEXT_PAGE_CALLBACK_DATA:
-            context.user_data[PRODUCT_LIST_PAGE] += 1
-            self.show_product_list(update, context)
-            return PRODUCT_LIST_STATE
-        elif callback_data == PREVIOUS_PAGE_CALLBACK_DATA:
-            context.user_data[PRODUCT_LIST_PAGE] -= 1
-            self.show_product_list(update, context)
-            return PRODUCT_LIST_STATE
+        button_handler = self._product_list_buttons.get(callback_data)
+        if button_handler is not None:
+            return button_handler(update, context)
 
         # callback_data is a product ID otherwise
         self.show_product_description(update=update, context=context, product_id=callback_data)
         return PRODUCT_DESCRIPTION_STATE
 
-    def handle_product_description_state(self, update: Update, context: CallbackContext) -> str:
+    def handle_product_description_state(self, update: Update, context: CallbackContext) -> int:
         """Move back to product list, show cart or add the product to a cart."""
         callback_data = update.callback_query.data
 
-        if callback_data == PRODUCT_LIST_CALLBACK_DATA:
-            self.show_product_list(update, context)
-            return PRODUCT_LIST_STATE
-        elif callback_data == SHOW_CART_CALLBACK_DATA:
-            self.show_cart(update, context)
-            return CART_STATE
+        button_handler = self._product_description_buttons.get(callback_data)
+        if button_handler is not None:
+            return button_handler(update, context)
+        elif not callback_data.startswith(ADD_TO_CART_CALLBACK_PREFIX):
+            update.callback_query.answer()
+            return PRODUCT_DESCRIPTION_STATE
 
-        # callback_data is a JSON containing product ID and amount
+        # callback_data contains product ID and amount to add to the cart
         product_id, amount = deserialize_product_id_and_amount(callback_data)
-        cart = self.elasticpath_api.carts.get_or_create_cart(
-            update.callback_query.message.chat_id,
+        self._cart_additions.add(
+            chat_id=update.callback_query.message.chat_id,
+            press=CartAdditionPress(product_id, amount, update, context),
         )
-        self.elasticpath_api.carts.add_product_to_cart(
-            product=self.elasticpath_api.products.get_product(product_id),
+        return PRODUCT_DESCRIPTION_STATE
+
+    def add_pressed_products_to_cart(
+            self, chat_id: int, presses: List[CartAdditionPress],
+    ) -> None:
+        """Add products from a burst of add-to-cart presses and show the last pressed product."""
+        last_press = presses[-1]
+        # the batch is handled apart from the chat updates, so it waits for them as well
+        self._chat_tasks.run(
+            chat_id,
+            ChatTask(
+                run=partial(self.handle_cart_additions, chat_id, presses),
+                update=last_press.update,
+                context=last_press.context,
+            ),
+        )
+
+    def handle_cart_additions(self, chat_id: int, presses: List[CartAdditionPress]) -> None:
+        """Add pressed products to the cart, show the last one if the user hasn't left it."""
+        *earlier_presses, last_press = presses
+        try:
+            cart, added_amount = self.add_pressed_products(chat_id, presses)
+        except Exception:
+            # an unanswered press leaves its button spinning
+            answer_presses(presses, text=ADD_TO_CART_FAILED_TEXT)
+            raise
+        answer_presses(earlier_presses)
+
+        session_key = f'{USER_SESSION_KEY_PREFIX}{chat_id}'
+        chat_state = self.users_db.hget(session_key, SESSION_STATE_FIELD)
+        if chat_state != str(PRODUCT_DESCRIPTION_STATE):
+            # the user has left the product meanwhile, the chat shows something else now
+            answer_presses([last_press], text=f'Added {added_amount}')
+            return
+        self.show_product_description(
+            update=last_press.update,
+            context=last_press.context,
+            product_id=last_press.product_id,
             cart=cart,
-            quantity=amount,
+            answer_text=f'Added {added_amount}',
         )
-        update.callback_query.answer('Added')
-        self.show_product_description(update=update, context=context, product_id=product_id)
-        return PRODUCT_DESCRIPTION_STATE
 
-    def handle_cart_state(self, update: Update, context: CallbackContext) -> str:
+    def add_pressed_products(
+            self, chat_id: int, presses: List[CartAdditionPress],
+    ) -> Tuple[Cart, int]:
+        """Add pressed products to the cart of the chat, return the cart and the added amount."""
+        amounts = {}
+        for press in presses:
+            amounts[press.product_id] = amounts.get(press.product_id, 0) + press.amount
+        cart_future = self._executor.submit(self.elasticpath_api.carts.get_or_create_cart, chat_id)
+        items = [
+            (self.product_cache.get_product(product_id), amount)
+            for product_id, amount in amounts.items()
+        ]
+        cart = cart_future.result()
+        addition_results = self.elasticpath_api.carts.add_products_to_cart(cart, items)
+        added_amount = sum(amounts[result['id']] for result in addition_results if result['ok'])
+        return cart, added_amount
+
+    def handle_cart_state(self, update: Update, context: CallbackContext) -> int:
         """Return back to product list, change the cart items or ask the location of the user."""
         callback_data = update.callback_query.data
 
-        if callback_data == PRODUCT_LIST_CALLBACK_DATA:
-            self.show_product_list(update, context)
-            return PRODUCT_LIST_STATE
-        elif callback_data == CHECKOUT_CALLBACK_DATA:
-            update.callback_query.message.reply_text('Please provide you location or address.')
-            return WAIT_LOCATION_STATE
+        button_handler = self._cart_buttons.get(callback_data)
+        if button_handler is not None:
+            return button_handler(update, context)
 
         # callback_data is an item ID
         cart = self.elasticpath_api.carts.get_or_create_cart(
@@ -135,7 +390,34 @@ class ElasticpathShopBot:
         self.show_cart(update, context)
         return CART_STATE
 
-    def handle_location_state(self, update: Update, context: CallbackContext) -> str:
+    def handle_next_page_button(self, update: Update, context: CallbackContext) -> int:
+        """Show the next product list page."""
+        context.chat_data[PRODUCT_LIST_PAGE] += 1
+        self.show_product_list(update, context)
+        return PRODUCT_LIST_STATE
+
+    def handle_previous_page_button(self, update: Update, context: CallbackContext) -> int:
+        """Show the previous product list page."""
+        context.chat_data[PRODUCT_LIST_PAGE] -= 1
+        self.show_product_list(update, context)
+        return PRODUCT_LIST_STATE
+
+    def handle_back_to_menu_button(self, update: Update, context: CallbackContext) -> int:
+        """Return back to product list."""
+        self.show_product_list(update, context)
+        return PRODUCT_LIST_STATE
+
+    def handle_show_cart_button(self, update: Update, context: CallbackContext) -> int:
+        """Show cart content."""
+        self.show_cart(update, context)
+        return CART_STATE
+
+    def handle_checkout_button(self, update: Update, context: CallbackContext) -> int:
+        """Ask the location of the user."""
+        update.callback_query.message.reply_text('Please provide you location or address.')
+        return WAIT_LOCATION_STATE
+
+    def handle_location_state(self, update: Update, context: CallbackContext) -> int:
         """Retrieve user's location, show delivery options."""
         if update.message.location is None:
             try:
@@ -147,20 +429,43 @@ class ElasticpathShopBot:
             location = update.message.location
             user_longitude, user_latitude = location.longitude, location.latitude
 
-        shop_distance = shop_distance_calculator(user_longitude, user_latitude)
-        nearest_shop = min(
-            self.elasticpath_api.flows.get_all_entries(self.shop_flow),
-            key=shop_distance,
-        )
+        nearest_shop, shop_distance = self.find_nearest_shop(user_longitude, user_latitude)
         self.show_delivery_options(
             update=update,
             context=context,
             nearest_shop=nearest_shop,
-            shop_distance=shop_distance(nearest_shop),
+            shop_distance=shop_distance,
         )
 
         return START_STATE
 
+    def find_nearest_shop(self, longitude: float, latitude: float) -> Tuple[Entry, int]:
+        """Find the shop nearest to the given position and the distance to it in meters."""
+        shops = self._shops
+        shop_distances = haversine_distances(
+            longitude,
+            latitude,
+            shops.longitudes,
+            shops.latitudes,
+        )
+        nearest_shop_index = shop_distances.argmin()
+        return shops.entries[nearest_shop_index], int(shop_distances[nearest_shop_index])
+
+    def refresh_shops(self, context: CallbackContext) -> None:
+        """Reload shops in background, so users never wait for them."""
+        self._shops = self.load_shops()
+
+    def load_shops(self) -> Shops:
+        """Load shops and keep their coordinates as arrays to search for the nearest one."""
+        shop_entries = list(self.elasticpath_api.flows.get_all_entries(self.shop_flow))
+        if not shop_entries:
+            raise NoShopsError(f'Flow {self.shop_flow} has no shop entries')
+        return Shops(
+            entries=shop_entries,
+            longitudes=np.radians([float(shop.fields['Longitude']) for shop in shop_entries]),
+            latitudes=np.radians([float(shop.fields['Latitude']) for shop in shop_entries]),
+        )
+
     def show_delivery_options(
             self,
             update: Update,
@@ -184,55 +489,65 @@ class ElasticpathShopBot:
 
     def show_product_list(self, update: Update, context: CallbackContext) -> None:
         """Display product list with navigation buttons."""
-        if update.callback_query is not None:
-            # delete the previous product list page
-            update.callback_query.delete_message()
-
+        if update.callback_query:
+            # the button press is acknowledged while the page is prepared
+            self.answer_in_background(update)
         menu_text = '*Please select a product:*'
-        buttons = []
-        products_to_display = self.elasticpath_api.products.get_products(
-            limit=PRODUCT_LIST_PAGE_SIZE,
-            offset=PRODUCT_LIST_PAGE_SIZE * context.user_data['page'],
-        )
-        for product in products_to_display:
-            buttons.append([InlineKeyboardButton(product.name, callback_data=product.id)])
-        buttons.append(self.navigation_buttons(update, context))
+        product_list_markup = self.product_list_markup(context.chat_data[PRODUCT_LIST_PAGE])
 
         if update.message:
             update.message.reply_text(
                 text=menu_text,
-                reply_markup=InlineKeyboardMarkup(buttons),
+                reply_markup=product_list_markup,
                 parse_mode=ParseMode.MARKDOWN,
             )
         else:
-            update.callback_query.answer()
-            update.callback_query.message.reply_text(
-                text=menu_text,
-                reply_markup=InlineKeyboardMarkup(buttons),
-                parse_mode=ParseMode.MARKDOWN,
-            )
+            replace_with_text(update, text=menu_text, reply_markup=product_list_markup)
+
+    def product_list_markup(self, page: int) -> InlineKeyboardMarkup:
+        """Get product list page buttons, they are the same for all users until catalog changes."""
+        products_version = self.product_cache.get_products_version()
+        cache_key = (page, products_version)
+        with self._page_markup_cache_lock:
+            if products_version != self._products_version:
+                # markups built for the previous catalog are never requested again
+                self._page_markup_cache.clear()
+                self._products_version = products_version
+            product_list_markup = self._page_markup_cache.get(cache_key)
+        if product_list_markup is not None:
+            return product_list_markup
+
+        # one extra product shows whether the next page exists
+        products_to_display = self.product_cache.get_products(
+            limit=PRODUCT_LIST_PAGE_SIZE + 1,
+            offset=PRODUCT_LIST_PAGE_SIZE * page,
+        )
+        buttons = [
+            [InlineKeyboardButton(product.name, callback_data=product.id)]
+            for product in products_to_display[:PRODUCT_LIST_PAGE_SIZE]
+        ]
+        buttons.append(
+            self.navigation_buttons(
+                page=page,
+                has_next_page=len(products_to_display) > PRODUCT_LIST_PAGE_SIZE,
+            ),
+        )
+        product_list_markup = InlineKeyboardMarkup(buttons)
+        with self._page_markup_cache_lock:
+            self._page_markup_cache[cache_key] = product_list_markup
+        return product_list_markup
 
-    def navigation_buttons(
-            self, update: Update, context: CallbackContext,
-    ) -> List[InlineKeyboardButton]:
-        """Show navigation buttons for product list."""
-        current_page = context.user_data['page']
+    def warm_up_product_list(self, context: CallbackContext) -> None:
+        """Refresh the first product list page, every new user starts from it."""
+        self.product_cache.refresh_products(limit=PRODUCT_LIST_PAGE_SIZE + 1, offset=0)
 
+    def navigation_buttons(self, page: int, has_next_page: bool) -> List[InlineKeyboardButton]:
+        """Show navigation buttons for product list."""
         navigation_buttons = []
-        if current_page > 0:
-            navigation_buttons.append(
-                InlineKeyboardButton('<<<', callback_data=PREVIOUS_PAGE_CALLBACK_DATA),
-            )
-        next_page_products_amount = len(
-            self.elasticpath_api.products.get_products(
-                limit=PRODUCT_LIST_PAGE_SIZE,
-                offset=PRODUCT_LIST_PAGE_SIZE * (current_page + 1),
-            ),
-        )
-        if next_page_products_amount > 0:
-            navigation_buttons.append(
-                InlineKeyboardButton('>>>', callback_data=NEXT_PAGE_CALLBACK_DATA),
-            )
+        if page > 0:
+            navigation_buttons.append(PREVIOUS_PAGE_BUTTON)
+        if has_next_page:
+            navigation_buttons.append(NEXT_PAGE_BUTTON)
 
         return navigation_buttons
 
@@ -241,13 +556,22 @@ class ElasticpathShopBot:
             update: Update,
             context: CallbackContext,
             product_id: str,
+            cart: Optional[Cart] = None,
+            answer_text: Optional[str] = None,
     ) -> None:
         """Display product description with checkout and menu buttons."""
-        update.callback_query.answer()
-
-        product = self.elasticpath_api.products.get_product(product_id)
-        cart = self.elasticpath_api.carts.get_or_create_cart(update.callback_query.message.chat_id)
-        amount_in_cart = self.elasticpath_api.carts.amount_of_product_in_cart(product.id, cart)
+        # the button press is acknowledged while the description is prepared
+        self.answer_in_background(update, answer_text)
+
+        # product card comes from the cache, the cart from Elasticpath, both are fetched at once
+        amount_in_cart_future = self._executor.submit(
+            self.get_amount_in_cart,
+            product_id=product_id,
+            chat_id=update.callback_query.message.chat_id,
+            cart=cart,
+        )
+        product, image_link = self.product_cache.get_product_card(product_id)
+        amount_in_cart = amount_in_cart_future.result()
 
         product_description = (
             f'*{product.name}*\n\n'
@@ -256,98 +580,221 @@ class ElasticpathShopBot:
             f'*In cart*: {amount_in_cart}\n\n'
             f'{product.description}\n'
         )
-        add_amount_buttons = []
-        for amount in AVAILABLE_PRODUCT_AMOUNTS:
-            add_amount_buttons.append(
-                InlineKeyboardButton(
-                    text=f'Add {amount}',
-                    callback_data=serialize_product_id_and_amount(
-                        product_id=product.id,
-                        amount=amount,
-                    ),
-                ),
-            )
-        buttons = [
-            add_amount_buttons,
-            [InlineKeyboardButton(text='Back to menu', callback_data=PRODUCT_LIST_CALLBACK_DATA)],
-            [InlineKeyboardButton(text='Show cart', callback_data=SHOW_CART_CALLBACK_DATA)],
-        ]
-
-        update.callback_query.message.reply_photo(
-            photo=self.elasticpath_api.files.get_file(product.main_image_id).link,
+        reply_markup = product_description_markup(product.id)
+        if image_link is None:
+            replace_with_text(update, text=product_description, reply_markup=reply_markup)
+            return
+        self.replace_with_product_photo(
+            update=update,
+            context=context,
+            image_link=image_link,
             caption=product_description,
-            reply_markup=InlineKeyboardMarkup(buttons),
-            parse_mode=ParseMode.MARKDOWN,
+            reply_markup=reply_markup,
+        )
+
+    def replace_with_product_photo(
+            self,
+            update: Update,
+            context: CallbackContext,
+            image_link: str,
+            caption: str,
+            reply_markup: InlineKeyboardMarkup,
+    ) -> None:
+        """Show product photo, send it by its Telegram ID when the bot has already sent it."""
+        bot_id = context.bot.id
+        telegram_photo_id = self.product_cache.get_telegram_photo_id(bot_id, image_link)
+        if telegram_photo_id is not None:
+            try:
+                replace_with_photo(
+                    update,
+                    photo=telegram_photo_id,
+                    caption=caption,
+                    reply_markup=reply_markup,
+                )
+                return
+            except BadRequest:
+                # the ID may be no longer valid, the photo is sent from the link then
+                self.product_cache.forget_telegram_photo_id(bot_id, image_link)
+
+        sent_message = replace_with_photo(
+            update,
+            photo=image_link,
+            caption=caption,
+            reply_markup=reply_markup,
         )
-        update.callback_query.delete_message()
+        if sent_message is not None:
+            # photo sent by its Telegram id isn't downloaded and uploaded by Telegram again
+            self.product_cache.save_telegram_photo_id(
+                bot_id,
+                image_link,
+                sent_message.photo[-1].file_id,
+            )
+
+    def get_amount_in_cart(self, product_id: str, chat_id: int, cart: Optional[Cart]) -> int:
+        """Get amount of a product in the user's cart, the cart is fetched unless provided."""
+        if cart is None:
+            cart = self.elasticpath_api.carts.get_or_create_cart(chat_id)
+        return self.elasticpath_api.carts.amount_of_product_in_cart(product_id, cart)
 
     def show_cart(self, update: Update, context: CallbackContext) -> None:
         """Show cart content with order and menu buttons."""
-        update.callback_query.answer()
+        # the button press is acknowledged while the cart is fetched
+        self.answer_in_background(update)
 
         buttons = []
-        message_text = '*Items in cart*:\n'
-        cart = self.elasticpath_api.carts.get_or_create_cart(
+        message_parts = ['*Items in cart*:\n']
+        cart, cart_items = self.elasticpath_api.carts.get_cart_with_items(
             update.callback_query.message.chat_id,
         )
-        for cart_item in self.elasticpath_api.carts.get_cart_items(cart):
-            message_text += (
+        for cart_item in cart_items:
+            message_parts.append(
                 f'*{cart_item.name}*\n'
                 f'*Price per unit*: {cart_item.formatted_price}\n'
                 f'*Quantity*: {cart_item.quantity}\n'
-                f'{cart_item.description}\n\n'
+                f'{cart_item.description}\n\n',
             )
             buttons.append(
                 [InlineKeyboardButton(text=f'Remove {cart_item.name}', callback_data=cart_item.id)],
             )
-        message_text += f'*Total price*: {cart.formatted_price}'
-        buttons.extend((
-            [InlineKeyboardButton(text='Checkout', callback_data=CHECKOUT_CALLBACK_DATA)],
-            [InlineKeyboardButton(text='Back to menu', callback_data=PRODUCT_LIST_CALLBACK_DATA)],
-        ))
-
-        update.callback_query.message.reply_text(
-            text=message_text,
+        message_parts.append(f'*Total price*: {cart.formatted_price}')
+        buttons.extend(CART_MENU_ROWS)
+
+        replace_with_text(
+            update,
+            text=''.join(message_parts),
             reply_markup=InlineKeyboardMarkup(buttons),
+        )
+
+    def answer_in_background(self, update: Update, text: Optional[str] = None) -> None:
+        """Acknowledge the button press without waiting for it, a failure is only logged."""
+        answer_future = self._answer_executor.submit(update.callback_query.answer, text)
+        answer_future.add_done_callback(log_answer_error)
+
+
+def log_answer_error(answer_future: Future) -> None:
+    """Log why the button press wasn't acknowledged, the press itself is handled anyway."""
+    answer_error = answer_future.exception()
+    if answer_error is not None:
+        logger.warning('Button press is not acknowledged: %s', answer_error)
+
+
+def replace_with_text(update: Update, text: str, reply_markup: InlineKeyboardMarkup) -> None:
+    """Show text in place of the message with the pressed button."""
+    query = update.callback_query
+    if query.message.photo:
+        # message with a photo can't be edited into a text one
+        query.message.reply_text(
+            text=text,
+            reply_markup=reply_markup,
             parse_mode=ParseMode.MARKDOWN,
         )
-        update.callback_query.delete_message()
+        query.delete_message()
+        return
 
+    with ignore_unmodified_message():
+        query.edit_message_text(text=text, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
 
-def serialize_product_id_and_amount(product_id: str, amount: int) -> str:
+
+def replace_with_photo(
+        update: Update,
+        photo: str,
+        caption: str,
+        reply_markup: InlineKeyboardMarkup,
+) -> Optional[Message]:
     """
-    Convert information about product and its amount into JSON string.
+    Show photo with a caption in place of the message with the pressed button.
 
-    Used to pass it as a callback query data.
+    Photo is either a link or an ID of a photo already sent to Telegram. Returns the sent message,
+    or None when the message already had the very same content.
     """
-    return json.dumps({'id': product_id, 'amount': amount})
+    query = update.callback_query
+    if not query.message.photo:
+        # text message can't be edited into a message with a photo
+        sent_message = query.message.reply_photo(
+            photo=photo,
+            caption=caption,
+            reply_markup=reply_markup,
+            parse_mode=ParseMode.MARKDOWN,
+        )
+        query.delete_message()
+        return sent_message
+
+    sent_message = None
+    with ignore_unmodified_message():
+        sent_message = query.edit_message_media(
+            media=InputMediaPhoto(photo, caption=caption, parse_mode=ParseMode.MARKDOWN),
+            reply_markup=reply_markup,
+        )
+    return sent_message
+
+
+def run_reporting_errors(task: ChatTask) -> None:
+    """Run the task, pass its error to the dispatcher error handlers instead of raising it."""
+    try:
+        task.run()
+    except Exception as error:
+        task.context.dispatcher.dispatch_error(task.update, error)
+
+
+def answer_presses(presses: List[CartAdditionPress], text: Optional[str] = None) -> None:
+    """Acknowledge add-to-cart presses, a press that can't be answered anymore is skipped."""
+    for press in presses:
+        with suppress(TelegramError):
+            press.update.callback_query.answer(text)
+
+
+@contextmanager
+def ignore_unmodified_message() -> Iterator[None]:
+    """Ignore the error Telegram returns when a message is edited to the very same content."""
+    try:
+        yield
+    except BadRequest as error:
+        if MESSAGE_NOT_MODIFIED_ERROR not in error.message:
+            raise
+
 
+@lru_cache(maxsize=PRODUCT_MARKUP_CACHE_SIZE)
+def product_description_markup(product_id: str) -> InlineKeyboardMarkup:
+    """Build buttons for product description, they depend only on the product."""
+    add_amount_buttons = [
+        InlineKeyboardButton(
+            text=f'Add {amount}',
+            callback_data=serialize_product_id_and_amount(product_id=product_id, amount=amount),
+        )
+        for amount in AVAILABLE_PRODUCT_AMOUNTS
+    ]
+    return InlineKeyboardMarkup([add_amount_buttons, *PRODUCT_DESCRIPTION_MENU_ROWS])
 
-def deserialize_product_id_and_amount(serialized_data: str) -> tuple:
-    """Extract information about product ID and it's amount from a JSON string."""
-    deserialized_data = json.loads(serialized_data)
-    return deserialized_data['id'], deserialized_data['amount']
 
+def serialize_product_id_and_amount(product_id: str, amount: int) -> str:
+    """
+    Convert information about product and its amount into a compact delimited string.
 
-def shop_distance_calculator(longitude: float, latitude: float) -> Callable:
-    """Create a function that calculates the distance between given position and arbitrary shop."""
-    def shop_distance(shop_entry: Entry) -> int:
-        """Calculate the distance to provided shop in meters."""
-        user_location = (longitude, latitude)
-        shop_location = (shop_entry.fields['Longitude'], shop_entry.fields['Latitude'])
+    Used to pass it as a callback query data, which is limited to 64 bytes by Telegram.
+    """
+    return f'{ADD_TO_CART_CALLBACK_PREFIX}{product_id}{CALLBACK_DATA_SEPARATOR}{amount}'
 
-        return int(distance(user_location, shop_location).meters)
 
-    return shop_distance
+def deserialize_product_id_and_amount(serialized_data: str) -> Tuple[str, int]:
+    """Extract information about product ID and it's amount from a delimited string."""
+    _, product_id, amount = serialized_data.split(CALLBACK_DATA_SEPARATOR, 2)
+    return product_id, int(amount)
 
 
 def start_bot() -> None:
     """Start Telegram bot."""
-    users_db = Redis(
+    settings = get_settings()
+    # decode_responses is a connection option, so it is set on the pool, not on the client
+    redis_pool = BlockingConnectionPool(
         host=settings.redis_host,
         port=settings.redis_port,
         password=settings.redis_password,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        socket_keepalive=True,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        decode_responses=True,
     )
+    users_db = Redis(connection_pool=redis_pool)
     elasticpath_api = ElasticpathAPI(client_id=settings.elasticpath_client_id)
 
     bot = ElasticpathShopBot(
@@ -355,12 +802,26 @@ def start_bot() -> None:
         users_db=users_db,
         shop_flow=settings.shop_flow,
     )
-    updater = Updater(settings.tg_bot_token)
+    updater = Updater(settings.tg_bot_token, workers=BOT_WORKERS)
     dispatcher = updater.dispatcher
 
-    dispatcher.add_handler(CallbackQueryHandler(bot.handle_users_reply))
-    dispatcher.add_handler(MessageHandler(Filters.location | Filters.text, bot.handle_users_reply))
-    dispatcher.add_handler(CommandHandler('start', bot.handle_users_reply))
+    updater.job_queue.run_repeating(
+        bot.warm_up_product_list,
+        interval=PRODUCT_LIST_WARM_UP_INTERVAL,
+        first=0,
+    )
+    updater.job_queue.run_repeating(
+        bot.refresh_shops,
+        interval=SHOPS_REFRESH_INTERVAL,
+        first=SHOPS_REFRESH_INTERVAL,
+    )
+
+    # handlers run in the worker pool, so a slow upstream call doesn't block other updates
+    dispatcher.add_handler(CallbackQueryHandler(bot.handle_users_reply, run_async=True))
+    dispatcher.add_handler(
+        MessageHandler(Filters.location | Filters.text, bot.handle_users_reply, run_async=True),
+    )
+    dispatcher.add_handler(CommandHandler('start', bot.handle_users_reply, run_async=True))
 
     updater.start_polling()
     updater.idle()
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+from geocoding import haversine_distances
+
+MOSCOW = (37.6173, 55.7558)
+SAINT_PETERSBURG = (30.3351, 59.9343)
+NOVOSIBIRSK = (82.9346, 55.0084)
+
+
+def places_in_radians(*places):
+    longitudes, latitudes = zip(*places)
+    return np.radians(longitudes), np.radians(latitudes)
+
+
+def test_distance_between_cities():
+    longitudes, latitudes = places_in_radians(SAINT_PETERSBURG, NOVOSIBIRSK)
+
+    distances = haversine_distances(*MOSCOW, longitudes, latitudes)
+
+    assert distances == pytest.approx([633_000, 2_810_000], rel=0.01)
+
+
+def test_distance_to_the_same_place():
+    longitudes, latitudes = places_in_radians(MOSCOW)
+
+    assert haversine_distances(*MOSCOW, longitudes, latitudes) == pytest.approx([0])
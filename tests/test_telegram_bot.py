@@ -0,0 +1,49 @@
+from unittest import mock
+
+import pytest
+
+from elasticpath.models import Entry
+from telegram_bot import ElasticpathShopBot, NoShopsError
+
+MOSCOW_SHOP = Entry({'id': 'moscow', 'Longitude': '37.6173', 'Latitude': '55.7558'})
+PETERSBURG_SHOP = Entry({'id': 'petersburg', 'Longitude': '30.3351', 'Latitude': '59.9343'})
+NOVOSIBIRSK_SHOP = Entry({'id': 'novosibirsk', 'Longitude': '82.9346', 'Latitude': '55.0084'})
+
+
+def make_bot(shop_entries):
+    elasticpath_api = mock.Mock()
+    elasticpath_api.flows.get_all_entries.return_value = iter(shop_entries)
+    return ElasticpathShopBot(
+        elasticpath_api=elasticpath_api,
+        users_db=mock.Mock(),
+        shop_flow='shops',
+    )
+
+
+@pytest.mark.parametrize(('longitude', 'latitude', 'nearest_shop'), [
+    (37.62, 55.75, MOSCOW_SHOP),
+    (30.31, 59.95, PETERSBURG_SHOP),
+    (82.92, 55.03, NOVOSIBIRSK_SHOP),
+    # Tver is between Moscow and Saint Petersburg, closer to Moscow
+    (35.9119, 56.8587, MOSCOW_SHOP),
+])
+def test_find_nearest_shop(longitude, latitude, nearest_shop):
+    bot = make_bot([NOVOSIBIRSK_SHOP, PETERSBURG_SHOP, MOSCOW_SHOP])
+
+    shop, _ = bot.find_nearest_shop(longitude, latitude)
+
+    assert shop is nearest_shop
+
+
+def test_find_nearest_shop_distance():
+    bot = make_bot([PETERSBURG_SHOP, NOVOSIBIRSK_SHOP])
+
+    shop, shop_distance = bot.find_nearest_shop(37.6173, 55.7558)
+
+    assert shop is PETERSBURG_SHOP
+    assert shop_distance == pytest.approx(633_000, rel=0.01)
+
+
+def test_no_shops_in_flow():
+    with pytest.raises(NoShopsError):
+        make_bot([])
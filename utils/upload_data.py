@@ -1,14 +1,20 @@
 """Ad hoc data upload functions for Elasticpath Shop Bot."""
+import functools
+import io
 import json
 import os
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 import httpx
 from slugify import slugify
 
 from elasticpath.api import ElasticpathAPI
 from elasticpath.models import Product
-from settings import settings
+from settings import get_settings
+
+UPLOAD_CONCURRENCY = 10
+DEFAULT_PICTURE_NAME = 'picture'
+DEFAULT_PICTURE_EXTENSION = '.jpg'
 
 
 def upload_products(products_file_name: str) -> None:
@@ -16,58 +22,82 @@ def upload_products(products_file_name: str) -> None:
     with open(products_file_name, 'r') as products_file:
         products_json = json.load(products_file)
 
+    settings = get_settings()
     elasticpath_api = ElasticpathAPI(
         client_id=settings.elasticpath_client_id,
         client_secret=settings.elasticpath_client_secret,
     )
 
-    for product_data in products_json:
-        product = elasticpath_api.products.create_product(
-            name=product_data['name'],
-            sku=product_data['name'],
-            slug=slugify(product_data['name']),
-            manage_stock=False,
+    # options that are the same for every product of the catalog
+    create_product = functools.partial(
+        elasticpath_api.products.create_product,
+        manage_stock=False,
+        price_currency='RUB',
+        price_includes_tax=True,
+        status='live',
+        commodity_type='physical',
+    )
+
+    def upload_product(product_data: dict, http_client: httpx.Client) -> None:
+        product_name = product_data['name']
+        product = create_product(
+            name=product_name,
+            sku=product_name,
+            slug=slugify(product_name),
             description=product_data['description'],
             price_amount=product_data['price'],
-            price_currency='RUB',
-            price_includes_tax=True,
-            status='live',
-            commodity_type='physical',
         )
-        add_picture_for_product(product, product_data['product_image']['url'])
+        add_picture_for_product(
+            product,
+            product_data['product_image']['url'],
+            elasticpath_api=elasticpath_api,
+            http_client=http_client,
+        )
 
+    # products are uploaded concurrently, each one waits for its picture to download and upload
+    with httpx.Client(limits=httpx.Limits(max_connections=UPLOAD_CONCURRENCY)) as http_client:
+        with ThreadPoolExecutor(max_workers=UPLOAD_CONCURRENCY) as executor:
+            # list() re-raises the first error of an upload
+            list(executor.map(
+                functools.partial(upload_product, http_client=http_client),
+                products_json,
+            ))
 
-def add_picture_for_product(product: Product, picture_url: str) -> None:
-    """Upload picture to Elasticpath and assign it as a main image for a product."""
-    elasticpath_api = ElasticpathAPI(
-        client_id=settings.elasticpath_client_id,
-        client_secret=settings.elasticpath_client_secret,
-    )
-    product_picture = httpx.get(picture_url).content
 
-    picture_file = tempfile.NamedTemporaryFile(delete=False, suffix='.jpg')
-    picture_file.write(product_picture)
-    picture_file.close()
+def add_picture_for_product(
+        product: Product,
+        picture_url: str,
+        elasticpath_api: ElasticpathAPI,
+        http_client: httpx.Client,
+) -> None:
+    """Upload picture to Elasticpath and assign it as a main image for a product."""
+    picture_response = http_client.get(picture_url)
+    picture_name = os.path.basename(picture_response.url.path) or DEFAULT_PICTURE_NAME
+    if not os.path.splitext(picture_name)[1]:
+        # content type of the uploaded file is guessed from its extension
+        picture_name = f'{picture_name}{DEFAULT_PICTURE_EXTENSION}'
 
-    elasticpath_file = elasticpath_api.files.create_file(picture_file.name)
+    elasticpath_file = elasticpath_api.files.create_file(
+        picture_name,
+        file_object=io.BytesIO(picture_response.content),
+    )
     elasticpath_api.products.add_main_image_to_product(elasticpath_file, product)
 
-    os.remove(picture_file.name)
-
 
 def upload_shops(shops_file_name: str, flow_slug: str) -> None:
     """Read file with shops data and upload that data to Elasticpath."""
     with open(shops_file_name, 'r') as shops_file:
         shops_json = json.load(shops_file)
 
+    settings = get_settings()
     elasticpath_api = ElasticpathAPI(
         client_id=settings.elasticpath_client_id,
         client_secret=settings.elasticpath_client_secret,
     )
 
+    create_shop_entry = functools.partial(elasticpath_api.flows.create_entry, flow=flow_slug)
     for shop_data in shops_json:
-        elasticpath_api.flows.create_entry(
-            flow=flow_slug,
+        create_shop_entry(
             fields={
                 'Address': shop_data['address']['full'],
                 'Alias': shop_data['alias'],